@@ -0,0 +1,51 @@
+from functools import wraps
+
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import func
+
+from app import db
+from models import AnalysisJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+def admin_required(view):
+    """Restrict a view to users listed in ADMIN_EMAILS"""
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if current_user.email.lower() not in current_app.config['ADMIN_EMAILS']:
+            flash('You do not have permission to view this page', 'danger')
+            return redirect(url_for('video_bp.dashboard'))
+        return view(*args, **kwargs)
+    return wrapped
+
+@admin_bp.route('/jobs')
+@admin_required
+def jobs():
+    """Overview of stuck, retried and dead-lettered analysis jobs"""
+    timeout = current_app.config['ANALYSIS_HEARTBEAT_TIMEOUT']
+    
+    state_counts = dict(db.session.query(AnalysisJob.state, func.count(AnalysisJob.id))
+                        .group_by(AnalysisJob.state).all())
+    
+    running_jobs = AnalysisJob.query.filter_by(state='running').all()
+    stuck_jobs = [job for job in running_jobs if job.is_stale(timeout)]
+    
+    retried_jobs = AnalysisJob.query.filter(
+        AnalysisJob.attempts > 1, AnalysisJob.state != 'dead'
+    ).order_by(AnalysisJob.created_at.desc()).limit(50).all()
+    
+    dead_jobs = AnalysisJob.query.filter_by(state='dead').order_by(
+        AnalysisJob.finished_at.desc()).limit(50).all()
+    
+    return render_template('admin_jobs.html',
+                           title='Analysis Jobs',
+                           state_counts=state_counts,
+                           heartbeat_timeout=timeout,
+                           stuck_jobs=stuck_jobs,
+                           retried_jobs=retried_jobs,
+                           dead_jobs=dead_jobs)
@@ -21,14 +21,49 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default-dev-secret")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
 
-# Configure the database to use SQLite
+# Configure the database to use SQLite, unless a shared database is given for multi-host deployments
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(basedir, 'aivora.db')}"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", f"sqlite:///{os.path.join(basedir, 'aivora.db')}")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
+
+# How analyses are run: "thread" starts them inside the web process,
+# "queue" leaves them for the standalone aivora-worker processes
+app.config["ANALYSIS_DISPATCH"] = os.environ.get("ANALYSIS_DISPATCH", "thread")
+
+# Background analysis supervision
+app.config["ANALYSIS_HEARTBEAT_INTERVAL"] = int(os.environ.get("ANALYSIS_HEARTBEAT_INTERVAL", 10))
+app.config["ANALYSIS_HEARTBEAT_TIMEOUT"] = int(os.environ.get("ANALYSIS_HEARTBEAT_TIMEOUT", 120))
+app.config["ANALYSIS_MAX_ATTEMPTS"] = int(os.environ.get("ANALYSIS_MAX_ATTEMPTS", 3))
+# Attempts running longer than this stop sending heartbeats, so hung-but-alive jobs are retried too
+app.config["ANALYSIS_MAX_RUNTIME"] = int(os.environ.get("ANALYSIS_MAX_RUNTIME", 600))
+app.config["ANALYSIS_SUPERVISOR_INTERVAL"] = int(os.environ.get("ANALYSIS_SUPERVISOR_INTERVAL", 30))
+app.config["ANALYSIS_SUPERVISOR_ENABLED"] = os.environ.get("ANALYSIS_SUPERVISOR_ENABLED", "1") != "0"
+
+# Request/job tracing: exporter is "file" (JSON lines), "http" (OTLP/JSON to a collector) or "none"
+app.config["TRACE_SAMPLE_RATE"] = float(os.environ.get("TRACE_SAMPLE_RATE", 0.1))
+app.config["TRACE_SLOW_THRESHOLD_MS"] = float(os.environ.get("TRACE_SLOW_THRESHOLD_MS", 10000))
+app.config["TRACE_EXPORTER"] = os.environ.get("TRACE_EXPORTER", "none")
+app.config["TRACE_FILE"] = os.environ.get("TRACE_FILE", os.path.join(basedir, 'traces.jsonl'))
+# The trace file is rotated to TRACE_FILE.1 once it reaches this size
+app.config["TRACE_FILE_MAX_BYTES"] = int(os.environ.get("TRACE_FILE_MAX_BYTES", 50 * 1024 * 1024))
+# Only continue inbound traceparent headers when a trusted proxy sets them
+app.config["TRACE_TRUST_INBOUND"] = os.environ.get("TRACE_TRUST_INBOUND", "0") == "1"
+app.config["TRACE_COLLECTOR_URL"] = os.environ.get("TRACE_COLLECTOR_URL", "http://localhost:4318/v1/traces")
+
+# Comma-separated list of emails allowed to view the admin pages
+app.config["ADMIN_EMAILS"] = [
+    email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()
+]
 
 # Initialize database
 db.init_app(app)
 
+# Initialize tracing
+from tracing import init_tracing
+init_tracing(app)
+
 # Configure login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -38,15 +73,17 @@ login_manager.login_message_category = 'info'
 
 # Import models and create tables
 with app.app_context():
-    from models import User, VideoAnalysis
+    from models import User, VideoAnalysis, AnalysisJob, AnalysisAttempt
     db.create_all()
 
     # Import and register blueprints
     from auth import auth_bp
     from video_analysis import video_bp
+    from admin import admin_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(video_bp)
+    app.register_blueprint(admin_bp)
 
 # Error handlers
 @app.errorhandler(404)
@@ -0,0 +1,19 @@
+# Production web role: gunicorn -c gunicorn.conf.py main:app
+# Web workers only enqueue analyses and serve pages; run aivora-worker for the analysis role.
+import os
+
+# The settings below are inherited by the forked web workers before they import the app
+os.environ.setdefault("ANALYSIS_DISPATCH", "queue")
+os.environ.setdefault("ANALYSIS_SUPERVISOR_ENABLED", "0")
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WEB_THREADS", 4))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+accesslog = "-"
+
+def post_worker_init(worker):
+    # Web workers only supervise background analyses if ANALYSIS_SUPERVISOR_ENABLED is turned on
+    from app import app
+    from jobs import start_supervisor
+    start_supervisor(app)
@@ -0,0 +1,273 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from models import VideoAnalysis, AnalysisJob, AnalysisAttempt
+from tracing import current_traceparent
+
+logger = logging.getLogger(__name__)
+
+def enqueue_analysis(analysis, max_attempts=None):
+    """
+    Create the job record that tracks a video analysis through the background workers.
+    The active trace context is stored so the worker can continue the trace.
+    The caller is responsible for committing the session.
+    """
+    from flask import current_app
+
+    job = AnalysisJob(
+        analysis=analysis,
+        state='queued',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config['ANALYSIS_MAX_ATTEMPTS'],
+        heartbeat_at=datetime.utcnow(),
+        trace_context=current_traceparent()
+    )
+    db.session.add(job)
+    return job
+
+def claim_job(analysis_id):
+    """
+    Atomically move a queued job to running and open a new attempt for it.
+    Returns (job, attempt), or (None, None) if the job is missing or already claimed.
+    """
+    job = AnalysisJob.query.filter_by(analysis_id=analysis_id).first()
+    if job is None:
+        # Analyses submitted before job tracking existed have no job record yet
+        analysis = VideoAnalysis.query.get(analysis_id)
+        if analysis is None or analysis.status != 'pending':
+            return None, None
+        job = enqueue_analysis(analysis)
+        db.session.commit()
+
+    return _claim(job)
+
+def claim_next_job(candidates=10):
+    """
+    Claim one of the oldest queued jobs for a standalone worker. Picking at random among
+    the oldest candidates keeps concurrent workers from all racing for the same job.
+    Returns (job, attempt), or (None, None) if nothing could be claimed.
+    """
+    job_ids = [row.id for row in db.session.query(AnalysisJob.id).filter_by(state='queued').order_by(
+        AnalysisJob.created_at).limit(candidates)]
+    random.shuffle(job_ids)
+
+    for job_id in job_ids:
+        job = AnalysisJob.query.get(job_id)
+        if job is None:
+            continue
+        job, attempt = _claim(job)
+        if job:
+            return job, attempt
+    return None, None
+
+def _claim(job):
+    """Move job from queued to running if nobody else has; returns (job, attempt) or (None, None)"""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        db.update(AnalysisJob)
+        .where(AnalysisJob.id == job.id, AnalysisJob.state == 'queued')
+        .values(state='running', attempts=AnalysisJob.attempts + 1, heartbeat_at=now)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None, None
+
+    db.session.refresh(job)
+    attempt = AnalysisAttempt(job_id=job.id, number=job.attempts, started_at=now)
+    db.session.add(attempt)
+    job.analysis.status = 'processing'
+    db.session.commit()
+    return job, attempt
+
+def finish_job(job, attempt, outcome, error=None):
+    """
+    Record the outcome of an attempt ('completed' or 'failed') on the job, provided the
+    attempt still owns it. Returns False if the supervisor has since re-queued or
+    dead-lettered the job, in which case the caller should discard its results.
+    The caller is responsible for committing the session.
+    """
+    now = datetime.utcnow()
+    owned = db.session.execute(
+        db.update(AnalysisJob)
+        .where(AnalysisJob.id == job.id,
+               AnalysisJob.state == 'running',
+               AnalysisJob.attempts == attempt.number)
+        .values(state=outcome, finished_at=now, last_error=error)
+    ).rowcount
+    if not owned:
+        return False
+
+    attempt.outcome = outcome
+    attempt.finished_at = now
+    attempt.error = error
+    return True
+
+def undispatched_analysis_ids(cutoff):
+    """Return analysis ids of jobs queued before cutoff that no worker has claimed yet"""
+    rows = db.session.query(AnalysisJob.analysis_id).filter(
+        AnalysisJob.state == 'queued',
+        AnalysisJob.heartbeat_at < cutoff
+    ).all()
+    return [row.analysis_id for row in rows]
+
+class Heartbeat:
+    """
+    Context manager that keeps a running job's heartbeat fresh from a background thread.
+    Beating stops once the attempt exceeds ANALYSIS_MAX_RUNTIME, so an attempt that hangs
+    (e.g. inside the Gemini call) is timed out and retried by the supervisor like a dead one.
+    """
+
+    def __init__(self, app, job_id, interval=None, max_runtime=None):
+        self.app = app
+        self.job_id = job_id
+        self.interval = interval or app.config['ANALYSIS_HEARTBEAT_INTERVAL']
+        self.max_runtime = max_runtime or app.config['ANALYSIS_MAX_RUNTIME']
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_runtime
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning(f"Job {self.job_id} exceeded {self.max_runtime} seconds; no longer sending heartbeats")
+                return
+            with self.app.app_context():
+                try:
+                    db.session.execute(
+                        db.update(AnalysisJob)
+                        .where(AnalysisJob.id == self.job_id, AnalysisJob.state == 'running')
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Failed to record heartbeat for job {self.job_id}: {str(e)}")
+
+def _adopt_orphaned_analyses(cutoff):
+    """Create job records for analyses left in 'processing' before job tracking existed"""
+    orphans = VideoAnalysis.query.outerjoin(AnalysisJob).filter(
+        VideoAnalysis.status == 'processing',
+        AnalysisJob.id.is_(None),
+        VideoAnalysis.created_at < cutoff
+    ).all()
+
+    for analysis in orphans:
+        job = enqueue_analysis(analysis)
+        job.state = 'running'
+        job.attempts = 1
+        job.heartbeat_at = analysis.created_at
+        db.session.flush()
+        db.session.add(AnalysisAttempt(job_id=job.id, number=1, started_at=analysis.created_at))
+
+    if orphans:
+        db.session.commit()
+        logger.info(f"Adopted {len(orphans)} orphaned analyses for supervision")
+
+def recover_stuck_jobs():
+    """
+    Find running jobs whose heartbeat is older than ANALYSIS_HEARTBEAT_TIMEOUT.
+    They are re-queued until they exhaust max_attempts, after which they are
+    dead-lettered and their analysis is marked failed. Queued jobs are left alone.
+    Returns (requeued_analysis_ids, dead_analysis_ids).
+    """
+    from flask import current_app
+
+    timeout = current_app.config['ANALYSIS_HEARTBEAT_TIMEOUT']
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=timeout)
+
+    _adopt_orphaned_analyses(cutoff)
+
+    stale_jobs = AnalysisJob.query.filter(
+        AnalysisJob.state == 'running',
+        AnalysisJob.heartbeat_at < cutoff
+    ).all()
+
+    requeued, dead = [], []
+    for job in stale_jobs:
+        exhausted = job.attempts >= job.max_attempts
+        new_state = 'dead' if exhausted else 'queued'
+
+        # Guard against another supervisor (or a late heartbeat) having touched the job
+        updated = db.session.execute(
+            db.update(AnalysisJob)
+            .where(AnalysisJob.id == job.id,
+                   AnalysisJob.state == 'running',
+                   AnalysisJob.heartbeat_at == job.heartbeat_at)
+            .values(state=new_state, heartbeat_at=now)
+        ).rowcount
+        if not updated:
+            db.session.rollback()
+            continue
+        db.session.refresh(job)
+
+        error = f"No heartbeat for {timeout} seconds (attempt {job.attempts} of {job.max_attempts})"
+        attempt = job.attempt_history.filter_by(number=job.attempts).first()
+        if attempt:
+            attempt.outcome = 'timed_out'
+            attempt.finished_at = now
+            attempt.error = error
+        job.last_error = error
+
+        if exhausted:
+            job.finished_at = now
+            job.analysis.status = 'failed'
+            job.analysis.summary = f"Analysis failed: {job.last_error}"
+            dead.append(job.analysis_id)
+            logger.warning(f"Dead-lettered analysis {job.analysis_id} after {job.attempts} attempts")
+        else:
+            job.analysis.status = 'pending'
+            requeued.append(job.analysis_id)
+            logger.warning(f"Re-queued stuck analysis {job.analysis_id} (attempt {job.attempts} of {job.max_attempts})")
+
+        db.session.commit()
+
+    return requeued, dead
+
+def _supervise(app):
+    """Supervisor loop: periodically recover stuck jobs and dispatch the re-queued ones"""
+    from video_analysis import start_analysis
+
+    interval = app.config['ANALYSIS_SUPERVISOR_INTERVAL']
+    timeout = app.config['ANALYSIS_HEARTBEAT_TIMEOUT']
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                requeued, _ = recover_stuck_jobs()
+                # In thread mode nothing else picks up queued jobs whose dispatching
+                # process died before a thread claimed them; the workers do in queue mode
+                if app.config['ANALYSIS_DISPATCH'] == 'thread':
+                    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+                    requeued += [analysis_id for analysis_id in undispatched_analysis_ids(cutoff)
+                                 if analysis_id not in requeued]
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error in analysis supervisor: {str(e)}")
+                continue
+
+            for analysis_id in requeued:
+                start_analysis(analysis_id)
+
+def start_supervisor(app):
+    """Start the background supervisor thread unless disabled in the config"""
+    if not app.config['ANALYSIS_SUPERVISOR_ENABLED']:
+        return None
+
+    thread = threading.Thread(target=_supervise, args=(app,), name='analysis-supervisor', daemon=True)
+    thread.start()
+    logger.debug("Analysis supervisor started")
+    return thread
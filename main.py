@@ -1,4 +1,11 @@
+import os
+
 from app import app
 
 if __name__ == '__main__':
+    # Recover analyses whose worker died mid-job. Only the reloader's serving
+    # child process runs the supervisor, not the parent that watches for changes.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from jobs import start_supervisor
+        start_supervisor(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,8 +1,16 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
+import zlib
+
+# Bump when the shape of VideoAnalysis.to_results_payload() changes
+RESULTS_PAYLOAD_VERSION = 1
+RESULTS_PAYLOAD_FIELDS = (
+    'status', 'title', 'video_url', 'video_format', 'subscribers', 'views', 'published_date',
+    'completed_at', 'fraud_score', 'confidence', 'summary', 'timeline'
+)
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -78,5 +86,78 @@ class VideoAnalysis(db.Model):
             'timeline_analysis': self.get_timeline_analysis()
         }
     
+    def results_etag(self, fields):
+        """Return the (weak) ETag value for the results payload, computed without building it"""
+        completed = int(self.completed_at.replace(tzinfo=timezone.utc).timestamp()) if self.completed_at else 0
+        fields_key = zlib.crc32(','.join(fields).encode('utf-8'))
+        return f'r{RESULTS_PAYLOAD_VERSION}-{self.id}-{self.status}-{completed}-{fields_key:08x}'
+    
+    def to_results_payload(self, fields=RESULTS_PAYLOAD_FIELDS):
+        """
+        Return a compact results payload for the results page charts.
+        Dates are epoch seconds, empty fields are omitted and the timeline is columnar.
+        """
+        payload = {'v': RESULTS_PAYLOAD_VERSION, 'id': self.id}
+        for field in fields:
+            if field == 'timeline':
+                events = self.get_timeline_analysis()
+                if events:
+                    payload['timeline'] = {
+                        'timestamp': [event.get('timestamp') for event in events],
+                        'confidence': [event.get('confidence') for event in events],
+                        'severity': [event.get('severity') for event in events],
+                        'description': [event.get('description') for event in events]
+                    }
+                continue
+            
+            value = getattr(self, field)
+            if value is None:
+                continue
+            if isinstance(value, datetime):
+                # Dates are stored as naive UTC
+                value = int(value.replace(tzinfo=timezone.utc).timestamp())
+            payload[field] = value
+        return payload
+    
     def __repr__(self):
         return f'<VideoAnalysis {self.id} {self.status}>'
+
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('video_analyses.id'), unique=True, nullable=False)
+    state = db.Column(db.String(32), default='queued')  # queued, running, completed, failed, dead
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    trace_context = db.Column(db.String(64))  # W3C traceparent of the submitting request
+    analysis = db.relationship('VideoAnalysis', backref=db.backref('job', uselist=False))
+    attempt_history = db.relationship('AnalysisAttempt', backref='job', lazy='dynamic',
+                                      order_by='AnalysisAttempt.number')
+    
+    def is_stale(self, timeout):
+        """Return True if the job is running but has not sent a heartbeat within timeout seconds"""
+        if self.state != 'running' or not self.heartbeat_at:
+            return False
+        return (datetime.utcnow() - self.heartbeat_at).total_seconds() > timeout
+    
+    def __repr__(self):
+        return f'<AnalysisJob {self.id} analysis={self.analysis_id} {self.state}>'
+
+class AnalysisAttempt(db.Model):
+    __tablename__ = 'analysis_attempts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('analysis_jobs.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    outcome = db.Column(db.String(32), default='running')  # running, completed, failed, timed_out
+    error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<AnalysisAttempt {self.job_id}#{self.number} {self.outcome}>'
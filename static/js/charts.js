@@ -3,21 +3,60 @@
  */
 
 document.addEventListener('DOMContentLoaded', function() {
-    // Initialize charts on results page
-    initializeFraudScoreGauge();
-    initializeTimelineChart();
-    initializeConfidenceChart();
+    // Load the results page charts lazily, after first paint
+    const resultsElement = document.querySelector('[data-results-url]');
+    if (resultsElement) {
+        window.addEventListener('load', function() {
+            requestAnimationFrame(() => loadResultsCharts(resultsElement.dataset.resultsUrl));
+        });
+    }
 });
 
+/**
+ * Fetch the compact results payload and initialize the results page charts.
+ * The endpoint sends an ETag, so repeat views are revalidated with a 304.
+ */
+function loadResultsCharts(resultsUrl) {
+    fetch(`${resultsUrl}?fields=fraud_score,confidence,timeline`, { credentials: 'same-origin' })
+        .then(response => {
+            // Leave the charts empty rather than drawing error responses as real scores
+            if (!response.ok) {
+                throw new Error(`Results request failed with status ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            initializeFraudScoreGauge(data.fraud_score || 0);
+            initializeConfidenceChart(data.confidence || 0, data.fraud_score || 0);
+            initializeTimelineChart(timelineRows(data.timeline));
+        })
+        .catch(error => {
+            console.error('Error loading results data:', error);
+        });
+}
+
+/**
+ * Convert the columnar timeline from the results payload into one object per event
+ */
+function timelineRows(timeline) {
+    if (!timeline || !timeline.timestamp) return [];
+    
+    return timeline.timestamp.map((timestamp, i) => ({
+        timestamp: timestamp,
+        timestamp_formatted: `${Math.floor(timestamp / 60)}:${String(timestamp % 60).padStart(2, '0')}`,
+        confidence: timeline.confidence[i],
+        severity: timeline.severity[i],
+        description: timeline.description[i]
+    }));
+}
+
 /**
  * Initialize the fraud score gauge chart
  */
-function initializeFraudScoreGauge() {
+function initializeFraudScoreGauge(fraudScore) {
     const gaugeElement = document.getElementById('fraud-score-gauge');
     if (!gaugeElement) return;
     
-    const fraudScore = parseFloat(gaugeElement.dataset.score || 0);
-    
     // Create gauge chart
     const ctx = gaugeElement.getContext('2d');
     
@@ -93,20 +132,9 @@ function initializeFraudScoreGauge() {
 /**
  * Initialize the timeline chart
  */
-function initializeTimelineChart() {
+function initializeTimelineChart(timelineData) {
     const timelineChartElement = document.getElementById('timeline-chart');
-    if (!timelineChartElement) return;
-    
-    // Get timeline data from the element's data attribute
-    let timelineData;
-    try {
-        timelineData = JSON.parse(timelineChartElement.dataset.timeline || '[]');
-    } catch (e) {
-        console.error('Error parsing timeline data:', e);
-        timelineData = [];
-    }
-    
-    if (timelineData.length === 0) return;
+    if (!timelineChartElement || !timelineData || timelineData.length === 0) return;
     
     // Prepare data for chart
     const labels = timelineData.map(item => item.timestamp_formatted);
@@ -176,13 +204,10 @@ function initializeTimelineChart() {
 /**
  * Initialize the confidence distribution chart
  */
-function initializeConfidenceChart() {
+function initializeConfidenceChart(confidence, fraudScore) {
     const confidenceChartElement = document.getElementById('confidence-chart');
     if (!confidenceChartElement) return;
     
-    const confidence = parseFloat(confidenceChartElement.dataset.confidence || 0);
-    const fraudScore = parseFloat(confidenceChartElement.dataset.score || 0);
-    
     // Prepare data
     const data = {
         labels: ['Low Confidence', 'Medium Confidence', 'High Confidence'],
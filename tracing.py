@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import urllib.request
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# The span currently active in this thread / context
+_current_span = ContextVar('current_span', default=None)
+
+# Module-level tracer settings, filled in by init_tracing()
+_config = {
+    'sample_rate': 0.0,
+    'slow_threshold_ms': None,
+    'exporter': None,
+}
+
+class Span:
+    """A timed operation within a trace, identified W3C trace-context style"""
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=False, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def traceparent(self):
+        """Return the span context as a W3C traceparent header value"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self):
+        end = self.end_time or time.time()
+        return round((end - self.start_time) * 1000, 3)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'sampled': self.sampled,
+            'attributes': self.attributes
+        }
+
+def parse_traceparent(value):
+    """Parse a W3C traceparent header into (trace_id, parent_id, sampled), or None if invalid"""
+    if not value:
+        return None
+    parts = value.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+def current_traceparent():
+    """Return the traceparent of the active span, or None outside a trace"""
+    active = _current_span.get()
+    return active.traceparent if active else None
+
+@contextmanager
+def _activate(new_span):
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except Exception as e:
+        new_span.status = 'error'
+        new_span.set_attribute('error', str(e))
+        raise
+    finally:
+        new_span.end_time = time.time()
+        _current_span.reset(token)
+        _export(new_span)
+
+def continue_trace(traceparent, name, **attributes):
+    """
+    Start a span that continues the trace described by traceparent.
+    A new trace (with a fresh sampling decision) is started if traceparent is missing or invalid.
+    """
+    parsed = parse_traceparent(traceparent)
+    if parsed:
+        trace_id, parent_id, sampled = parsed
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < _config['sample_rate']
+    return _activate(Span(name, trace_id, parent_id, sampled, attributes))
+
+def span(name, **attributes):
+    """Start a child span of the active span, or a new trace if there is none"""
+    parent = _current_span.get()
+    if parent is None:
+        return continue_trace(None, name, **attributes)
+    return _activate(Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes))
+
+def _export(finished_span):
+    exporter = _config['exporter']
+    if exporter is None:
+        return
+    slow_threshold = _config['slow_threshold_ms']
+    if finished_span.sampled:
+        exporter.export(finished_span.to_dict())
+    elif slow_threshold is not None and finished_span.duration_ms >= slow_threshold:
+        # Keep tail-latency outliers even when their trace was not sampled
+        record = finished_span.to_dict()
+        record['slow'] = True
+        exporter.export(record)
+
+class _QueueExporter(ABC):
+    """Base exporter that hands spans to a background thread so requests never block on I/O"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.debug("Trace export queue full, dropping span")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans: {str(e)}")
+
+    @abstractmethod
+    def write(self, batch):
+        """Deliver a batch of span records"""
+
+class FileExporter(_QueueExporter):
+    """
+    Append spans as JSON lines to a local file.
+    Each line is a single write on an O_APPEND descriptor, so web and worker
+    processes sharing the file never interleave partial lines. Once the file
+    reaches max_bytes it is rotated to <path>.1, replacing any previous one.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._fd = self._open()
+        super().__init__()
+
+    def _open(self):
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _rotate_if_needed(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        written = os.fstat(self._fd)
+
+        # Another process rotated the file: follow it to the new one
+        if current is None or current.st_ino != written.st_ino:
+            os.close(self._fd)
+            self._fd = self._open()
+            return
+
+        if written.st_size >= self.max_bytes:
+            os.replace(self.path, self.path + '.1')
+            os.close(self._fd)
+            self._fd = self._open()
+
+    def write(self, batch):
+        self._rotate_if_needed()
+        for record in batch:
+            os.write(self._fd, (json.dumps(record) + '\n').encode('utf-8'))
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _otlp_span(record):
+    """Convert an exported span record to the OTLP/JSON span representation"""
+    start_ns = int(record['start_time'] * 1e9)
+    otlp = {
+        'traceId': record['trace_id'],
+        'spanId': record['span_id'],
+        'name': record['name'],
+        'kind': 1,  # SPAN_KIND_INTERNAL
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(start_ns + int(record['duration_ms'] * 1e6)),
+        'attributes': [{'key': key, 'value': _otlp_value(value)}
+                       for key, value in record['attributes'].items()],
+        'status': {'code': 2 if record['status'] == 'error' else 1}
+    }
+    if record['parent_id']:
+        otlp['parentSpanId'] = record['parent_id']
+    return otlp
+
+class HttpExporter(_QueueExporter):
+    """POST batches of spans as OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, url, service_name='aivora'):
+        self.url = url
+        self.service_name = service_name
+        super().__init__()
+
+    def write(self, batch):
+        payload = {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]
+                },
+                'scopeSpans': [{
+                    'scope': {'name': 'aivora.tracing'},
+                    'spans': [_otlp_span(record) for record in batch]
+                }]
+            }]
+        }
+        body = json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(request, timeout=5).close()
+
+def init_tracing(app):
+    """Configure sampling and the span exporter from the app config"""
+    _config['sample_rate'] = app.config['TRACE_SAMPLE_RATE']
+    _config['slow_threshold_ms'] = app.config['TRACE_SLOW_THRESHOLD_MS']
+
+    exporter = app.config['TRACE_EXPORTER']
+    if exporter == 'file':
+        _config['exporter'] = FileExporter(app.config['TRACE_FILE'], app.config['TRACE_FILE_MAX_BYTES'])
+    elif exporter == 'http':
+        _config['exporter'] = HttpExporter(app.config['TRACE_COLLECTOR_URL'])
+    else:
+        _config['exporter'] = None
+    logger.debug(f"Tracing initialized (exporter={exporter}, sample_rate={_config['sample_rate']})")
+
+def slowest_traces(path, limit=10):
+    """Group exported spans by trace and return the slowest traces, longest first"""
+    traces = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            traces.setdefault(record['trace_id'], []).append(record)
+
+    summaries = []
+    for trace_id, spans in traces.items():
+        start = min(s['start_time'] for s in spans)
+        end = max(s['start_time'] + s['duration_ms'] / 1000 for s in spans)
+        summaries.append({
+            'trace_id': trace_id,
+            'duration_ms': round((end - start) * 1000, 3),
+            'spans': sorted(spans, key=lambda s: s['start_time'])
+        })
+    return sorted(summaries, key=lambda t: t['duration_ms'], reverse=True)[:limit]
+
+if __name__ == '__main__':
+    # Usage: python tracing.py [traces.jsonl] [limit]
+    trace_file = sys.argv[1] if len(sys.argv) > 1 else 'traces.jsonl'
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for trace in slowest_traces(trace_file, limit):
+        print(f"{trace['trace_id']}  {trace['duration_ms']:.1f} ms")
+        for s in trace['spans']:
+            print(f"    {s['name']:<32} {s['duration_ms']:>10.1f} ms  {s['status']}")
@@ -1,12 +1,13 @@
 import os
 import json
+import gzip
 import logging
 from datetime import datetime
 import threading
 import re
 from urllib.parse import urlparse
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, make_response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, make_response, current_app
 from pdf_generator import generate_analysis_pdf
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
@@ -14,8 +15,10 @@ from wtforms import StringField, SubmitField
 from wtforms.validators import DataRequired, URL
 
 from app import db
-from models import VideoAnalysis
+from models import VideoAnalysis, RESULTS_PAYLOAD_FIELDS
 from gemini_client import GeminiClient
+from jobs import enqueue_analysis, claim_job, finish_job, Heartbeat
+from tracing import continue_trace, span, parse_traceparent
 
 logger = logging.getLogger(__name__)
 
@@ -64,32 +67,57 @@ def analyze_video(analysis_id):
     
     # Use application context in the thread
     with app.app_context():
+        # Claim the job; another thread may already be working on it
         try:
-            # Get the analysis record
-            analysis = VideoAnalysis.query.get(analysis_id)
-            if not analysis:
-                logger.error(f"Analysis with ID {analysis_id} not found")
-                return
-            
-            # Update status to processing
-            analysis.status = 'processing'
-            db.session.commit()
+            job, attempt = claim_job(analysis_id)
+        except Exception as e:
+            # The job is still queued and will be picked up again
+            db.session.rollback()
+            logger.error(f"Error claiming analysis {analysis_id}: {str(e)}")
+            return
+        if not job:
+            logger.info(f"Analysis {analysis_id} not claimed; it is missing or already running")
+            return
+        
+        run_analysis(app, job, attempt)
+
+def run_analysis(app, job, attempt):
+    """
+    Analyze the video of a job this worker has claimed. Must run inside an app context.
+    """
+    analysis_id = job.analysis_id
+    
+    # Continue the trace started by the request that submitted the video
+    with continue_trace(job.trace_context, 'analysis.worker',
+                        analysis_id=analysis_id, attempt=attempt.number) as worker_span:
+        try:
+            analysis = job.analysis
             
-            try:
-                # Extract video metadata (in a real implementation)
-                metadata = extract_video_metadata(analysis.video_url)
-                analysis.title = metadata.get('title')
-                analysis.video_format = metadata.get('video_format')
-                analysis.subscribers = metadata.get('subscribers')
-                analysis.views = metadata.get('views')
-                analysis.published_date = metadata.get('published_date')
-                db.session.commit()
-            except Exception as e:
-                logger.error(f"Error extracting metadata: {str(e)}")
-                # Continue analysis even if metadata extraction fails
+            with Heartbeat(app, job.id):
+                try:
+                    # Extract video metadata (in a real implementation)
+                    with span('video.extract_metadata'):
+                        metadata = extract_video_metadata(analysis.video_url)
+                    analysis.title = metadata.get('title')
+                    analysis.video_format = metadata.get('video_format')
+                    analysis.subscribers = metadata.get('subscribers')
+                    analysis.views = metadata.get('views')
+                    analysis.published_date = metadata.get('published_date')
+                    with span('db.commit', operation='save_metadata'):
+                        db.session.commit()
+                except Exception as e:
+                    logger.error(f"Error extracting metadata: {str(e)}")
+                    # Continue analysis even if metadata extraction fails
+                
+                # Call Gemini API for fraud detection
+                with span('gemini.analyze_video', video_url=analysis.video_url):
+                    result = gemini_client.analyze_video(analysis.video_url)
             
-            # Call Gemini API for fraud detection
-            result = gemini_client.analyze_video(analysis.video_url)
+            # Only save results if the supervisor has not re-queued or dead-lettered the job meanwhile
+            if not finish_job(job, attempt, 'completed'):
+                db.session.rollback()
+                logger.warning(f"Discarding results for analysis {analysis_id}; attempt {attempt.number} no longer owns the job")
+                return
             
             # Update analysis with results
             analysis.fraud_score = result.get('fraud_score', 0.0)
@@ -99,21 +127,40 @@ def analyze_video(analysis_id):
             analysis.status = 'completed'
             analysis.completed_at = datetime.utcnow()
             
-            db.session.commit()
+            with span('db.commit', operation='save_results'):
+                db.session.commit()
             logger.info(f"Analysis for video {analysis.id} completed successfully")
         except Exception as e:
             logger.error(f"Error in analysis thread: {str(e)}")
+            worker_span.status = 'error'
+            worker_span.set_attribute('error', str(e))
             try:
-                # Get the analysis record again in case it wasn't defined in the outer try block
-                if 'analysis' not in locals() or analysis is None:
+                db.session.rollback()
+                # Only fail the analysis while this attempt still owns the job
+                if finish_job(job, attempt, 'failed', str(e)):
                     analysis = VideoAnalysis.query.get(analysis_id)
-                if analysis:
                     analysis.status = 'failed'
                     analysis.summary = f"Analysis failed: {str(e)}"
-                    db.session.commit()
+                db.session.commit()
             except Exception as ex:
                 logger.error(f"Failed to update analysis status to failed: {str(ex)}")
 
+def start_analysis(analysis_id):
+    """
+    Start analyzing a video in a background thread.
+    In queue mode the job is left queued for the standalone workers instead.
+    """
+    if current_app.config['ANALYSIS_DISPATCH'] == 'queue':
+        return None
+    
+    analysis_thread = threading.Thread(
+        target=analyze_video,
+        args=(analysis_id,)
+    )
+    analysis_thread.daemon = True
+    analysis_thread.start()
+    return analysis_thread
+
 @video_bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -127,15 +174,23 @@ def dashboard():
     
     if form.validate_on_submit():
         try:
-            # Create a new analysis record
-            analysis = VideoAnalysis(
-                user_id=current_user.id,
-                video_url=form.video_url.data,
-                status='pending'
-            )
+            # Client-supplied trace context (and its sampled flag) is only honoured behind a trusted proxy
+            inbound = request.headers.get('traceparent') if current_app.config['TRACE_TRUST_INBOUND'] else None
             
-            db.session.add(analysis)
-            db.session.commit()
+            # Start the trace that follows this analysis through the worker
+            with continue_trace(inbound, 'POST /dashboard',
+                                user_id=current_user.id):
+                # Create a new analysis record
+                analysis = VideoAnalysis(
+                    user_id=current_user.id,
+                    video_url=form.video_url.data,
+                    status='pending'
+                )
+                
+                db.session.add(analysis)
+                enqueue_analysis(analysis)
+                with span('db.commit', operation='create_analysis'):
+                    db.session.commit()
             
             # Redirect to the analyzing page
             return redirect(url_for('video_bp.analyzing', analysis_id=analysis.id))
@@ -164,15 +219,9 @@ def analyzing(analysis_id):
         flash('You do not have permission to view this analysis', 'danger')
         return redirect(url_for('video_bp.dashboard'))
     
-    # If analysis is still pending, start it
+    # If analysis is still pending, start it (or leave it for the workers in queue mode)
     if analysis.status == 'pending':
-        # Start the analysis in a separate thread
-        analysis_thread = threading.Thread(
-            target=analyze_video,
-            args=(analysis_id,)
-        )
-        analysis_thread.daemon = True
-        analysis_thread.start()
+        start_analysis(analysis_id)
     
     # If analysis is complete or failed, redirect to results
     if analysis.status in ['completed', 'failed']:
@@ -216,6 +265,47 @@ def results(analysis_id):
                            title='Analysis Results', 
                            analysis=analysis)
 
+@video_bp.route('/results/<int:analysis_id>/data')
+@login_required
+def results_data(analysis_id):
+    """
+    Compact results payload for the results page charts.
+    Supports ?fields= selection, ETag/If-None-Match revalidation and gzip.
+    """
+    analysis = VideoAnalysis.query.get_or_404(analysis_id)
+    
+    # Security check
+    if analysis.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    fields = RESULTS_PAYLOAD_FIELDS
+    if request.args.get('fields'):
+        fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+        unknown = [field for field in fields if field not in RESULTS_PAYLOAD_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    # Results only stop changing once the analysis has finished
+    finished = analysis.status in ['completed', 'failed']
+    etag = analysis.results_etag(fields) if finished else None
+    if etag and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        body = json.dumps(analysis.to_results_payload(fields), separators=(',', ':')).encode('utf-8')
+        response = make_response(body)
+        response.headers['Content-Type'] = 'application/json'
+        if 'gzip' in request.headers.get('Accept-Encoding', '') and len(body) > 256:
+            response.set_data(gzip.compress(body))
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @video_bp.route('/history')
 @login_required
 def history():
@@ -243,9 +333,14 @@ def download_report(analysis_id):
         flash('Report can only be downloaded for completed analyses', 'warning')
         return redirect(url_for('video_bp.results', analysis_id=analysis_id))
     
-    # Generate PDF report
+    # Generate PDF report. Downloads can happen long after the analysis, so they get
+    # their own trace that records the analysis trace id instead of joining it.
     try:
-        pdf_data = generate_analysis_pdf(analysis)
+        analysis_trace = parse_traceparent(analysis.job.trace_context) if analysis.job else None
+        link = {'linked_trace_id': analysis_trace[0]} if analysis_trace else {}
+        with continue_trace(None, 'GET /download-report', analysis_id=analysis_id, **link):
+            with span('pdf.generate'):
+                pdf_data = generate_analysis_pdf(analysis)
         
         # Prepare response with PDF attachment
         response = make_response(pdf_data)
@@ -0,0 +1,132 @@
+"""
+Standalone analysis worker (the aivora-worker command).
+
+Consumes queued analysis jobs from the shared database so that video analysis
+runs outside the web processes. Run the web tier with ANALYSIS_DISPATCH=queue
+(see gunicorn.conf.py) and scale the two roles independently, e.g.:
+
+    aivora-worker --processes 2 --threads 4   (or: python worker.py)
+"""
+import os
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+
+logger = logging.getLogger('aivora.worker')
+
+def _consume(app, stop, poll_interval):
+    """Worker thread: claim and analyze queued jobs until asked to stop"""
+    from app import db
+    from jobs import claim_next_job
+    from video_analysis import run_analysis
+
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job, attempt = claim_next_job()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error claiming from the analysis queue: {str(e)}")
+                job = None
+
+            if job is not None:
+                try:
+                    run_analysis(app, job, attempt)
+                except Exception as e:
+                    logger.error(f"Error analyzing analysis {job.analysis_id}: {str(e)}")
+                continue
+
+        stop.wait(poll_interval)
+
+def run_process(threads, poll_interval, supervise):
+    """Entry point of one worker process: run the consumer threads until SIGTERM/SIGINT"""
+    os.environ['ANALYSIS_DISPATCH'] = 'queue'
+
+    from app import app
+    from jobs import start_supervisor
+
+    # Only one process per worker command runs the stuck-job supervisor,
+    # and never if the operator disabled it with ANALYSIS_SUPERVISOR_ENABLED=0
+    if supervise:
+        start_supervisor(app)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    consumers = [
+        threading.Thread(target=_consume, args=(app, stop, poll_interval), name=f'analysis-worker-{i}')
+        for i in range(threads)
+    ]
+    for consumer in consumers:
+        consumer.start()
+    logger.info(f"Worker process {os.getpid()} started with {threads} threads")
+
+    # Keep the main thread free to receive signals; consumers finish their current job on shutdown
+    while not stop.is_set():
+        stop.wait(1)
+    for consumer in consumers:
+        consumer.join()
+    logger.info(f"Worker process {os.getpid()} stopped")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='aivora-worker', description='Run Aivora video analysis workers')
+    parser.add_argument('--processes', type=int,
+                        default=int(os.environ.get('ANALYSIS_WORKER_PROCESSES', 1)),
+                        help='number of worker processes (default: %(default)s)')
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('ANALYSIS_WORKER_THREADS', 4)),
+                        help='consumer threads per process (default: %(default)s)')
+    parser.add_argument('--poll-interval', type=float,
+                        default=float(os.environ.get('ANALYSIS_WORKER_POLL_INTERVAL', 2.0)),
+                        help='seconds to wait when the queue is empty (default: %(default)s)')
+    parser.add_argument('--no-supervisor', action='store_true',
+                        help='do not recover stuck jobs from this host')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.processes <= 1:
+        run_process(args.threads, args.poll_interval, not args.no_supervisor)
+        return
+
+    # Spawn rather than fork so each process builds its own app, engine and threads
+    ctx = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+
+    def start(index):
+        process = ctx.Process(
+            target=run_process,
+            args=(args.threads, args.poll_interval, index == 0 and not args.no_supervisor),
+            name=f'aivora-worker-{index}'
+        )
+        process.start()
+        return process
+
+    def shutdown(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    processes = [start(i) for i in range(args.processes)]
+    logger.info(f"Started {args.processes} worker processes x {args.threads} threads")
+
+    # Restart worker processes that die unexpectedly; their jobs are recovered by the supervisor
+    while not stopping.is_set():
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning(f"Worker process {process.pid} exited with {process.exitcode}, restarting")
+                processes[i] = start(i)
+        stopping.wait(1)
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()